@@ -0,0 +1,70 @@
+"""Per-worker component singletons, built lazily on first use"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from app.config import Config
+from app.core.router import Router
+from app.core.planner import Planner
+from app.core.executor_simple import Executor
+from app.storage.database import Database
+from app.storage.artifacts import ArtifactManager
+from app.storage.run_cache import RunCache
+from app.mcp.client_pool import MCPClientPool
+
+@lru_cache(maxsize=1)
+def get_db() -> Database:
+    return Database()
+
+@lru_cache(maxsize=1)
+def get_artifacts() -> ArtifactManager:
+    return ArtifactManager()
+
+@lru_cache(maxsize=1)
+def get_mcp_pool() -> MCPClientPool:
+    return MCPClientPool()
+
+@lru_cache(maxsize=1)
+def get_route_classifier() -> Router:
+    return Router()
+
+@lru_cache(maxsize=1)
+def get_planner() -> Planner:
+    return Planner()
+
+@lru_cache(maxsize=1)
+def get_executor() -> Executor:
+    return Executor(get_db(), get_artifacts(), get_mcp_pool())
+
+@lru_cache(maxsize=1)
+def get_run_cache() -> RunCache:
+    return RunCache()
+
+_arq_pool = None
+
+async def get_arq_pool():
+    """ARQ connection pool, None unless RUN_QUEUE=arq"""
+    global _arq_pool
+    if _arq_pool is None and Config.RUN_QUEUE == "arq":
+        from arq import create_pool
+        from arq.connections import RedisSettings
+        _arq_pool = await create_pool(RedisSettings.from_dsn(Config.REDIS_URL))
+    return _arq_pool
+
+async def close_arq_pool():
+    global _arq_pool
+    if _arq_pool is not None:
+        await _arq_pool.aclose()
+        _arq_pool = None
+
+def size_thread_pool():
+    """Give asyncio.to_thread a pool sized by EXECUTOR_THREADS"""
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=Config.EXECUTOR_THREADS)
+    )
+
+def warm_up():
+    """Build all components up front so the first request doesn't pay for it"""
+    get_route_classifier()
+    get_planner()
+    get_executor()
+    get_run_cache()
@@ -1,5 +1,9 @@
 import os
 from pathlib import Path
+from dotenv import load_dotenv
+
+# Settings are read at import time, so .env must be loaded first (API and ARQ worker alike)
+load_dotenv()
 
 class Config:
     """Configuration management using environment variables"""
@@ -10,6 +14,33 @@ class Config:
     # Artifacts storage
     ARTIFACTS_PATH = os.getenv("ARTIFACTS_PATH", "./artifacts")
     
+    # Run result cache (shared across workers when REDIS_URL is set)
+    REDIS_URL = os.getenv("REDIS_URL")
+    REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "32"))
+    RUN_CACHE_TTL_SEC = int(os.getenv("RUN_CACHE_TTL_SEC", "3600"))
+    RUN_CACHE_MAX_ENTRIES = int(os.getenv("RUN_CACHE_MAX_ENTRIES", "10000"))
+    
+    # Run execution: "background" (in-process) or "arq" (Redis queue + worker)
+    RUN_QUEUE = os.getenv("RUN_QUEUE", "background").lower()
+    
+    # Default thread pool for blocking work (PDF parsing, SQLite, file I/O)
+    EXECUTOR_THREADS = int(os.getenv("EXECUTOR_THREADS", str(min(32, (os.cpu_count() or 1) * 2))))
+    
+    # Nodes of one run executing at once (0 = no limit)
+    MAX_PARALLEL_NODES = int(os.getenv("MAX_PARALLEL_NODES", "0"))
+    
+    # Outputs of pure nodes remembered by idempotency key and reused across runs (0 disables)
+    NODE_CACHE_SIZE = int(os.getenv("NODE_CACHE_SIZE", "0"))
+    # Oldest reusable output, in seconds (also bounds lookups of earlier runs in the DB)
+    NODE_CACHE_TTL_SEC = int(os.getenv("NODE_CACHE_TTL_SEC", "3600"))
+    
+    # Routing decisions remembered per (query, file path) (0 disables)
+    ROUTE_CACHE_SIZE = int(os.getenv("ROUTE_CACHE_SIZE", "1024"))
+    
+    # PDFs with at least this many pages are parsed across worker processes (0 disables)
+    PDF_PROCESS_PAGES = int(os.getenv("PDF_PROCESS_PAGES", "16"))
+    PDF_PROCESS_WORKERS = int(os.getenv("PDF_PROCESS_WORKERS", str(os.cpu_count() or 1)))
+    
     # Data sources
     ORDERS_CSV_PATH = os.getenv("ORDERS_CSV_PATH", "./samples/orders.csv")
     TRACKING_JSON_PATH = os.getenv("TRACKING_JSON_PATH", "./samples/tracking.json")
@@ -24,10 +55,33 @@ class Config:
     HOST = os.getenv("HOST", "0.0.0.0")
     PORT = int(os.getenv("PORT", "8000"))
     
+    # Seconds a /v1/metrics snapshot is served before re-querying
+    METRICS_TTL_SEC = int(os.getenv("METRICS_TTL_SEC", "5"))
+    
+    # Logging (DEBUG events are dropped before rendering above this level)
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+    
+    _ensured = False
+    
     @classmethod
     def ensure_directories(cls):
-        """Create necessary directories"""
-        for path_attr in ["DATABASE_PATH", "ARTIFACTS_PATH", "ORDERS_CSV_PATH", 
-                         "TRACKING_JSON_PATH", "CAPABILITY_INDEX_PATH"]:
-            path = getattr(cls, path_attr)
-            Path(path).parent.mkdir(parents=True, exist_ok=True)
\ No newline at end of file
+        """Create necessary directories (once per process)"""
+        if cls._ensured:
+            return
+        
+        # Most paths share a parent; mkdir each distinct one once
+        parents = {Path(getattr(cls, path_attr)).parent
+                   for path_attr in ["DATABASE_PATH", "ARTIFACTS_PATH", "ORDERS_CSV_PATH",
+                                     "TRACKING_JSON_PATH", "CAPABILITY_INDEX_PATH"]}
+        for parent in parents:
+            parent.mkdir(parents=True, exist_ok=True)
+        cls._ensured = True
+    
+    @classmethod
+    def validate(cls):
+        """Reject settings that would only fail once a run is started"""
+        if cls.RUN_QUEUE == "arq" and not cls.REDIS_URL:
+            raise RuntimeError(
+                "RUN_QUEUE=arq requires REDIS_URL: workers and the API share the queue "
+                "and run results through Redis"
+            )
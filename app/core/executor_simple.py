@@ -1,19 +1,182 @@
 import asyncio
-import hashlib
+import heapq
 import json
 import time
 import base64
+import io
 import re
 import os
-import uuid
+import tempfile
+import threading
+import multiprocessing
+import orjson
+import pandas as pd
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from dateutil import parser
 from typing import Dict, Any, Optional, List
-import networkx as nx
+from app.config import Config
 from app.storage.database import Database
 from app.storage.artifacts import ArtifactManager
 from app.mcp.client_pool import MCPClientPool
 from app.observability.logger import log_node_execution, logger
+from app.util.hashing import digest
+
+try:
+    from asyncio import timeout as node_timeout  # Python 3.11+
+except ImportError:
+    from async_timeout import timeout as node_timeout
+
+# Plan DAG as integer-indexed adjacency lists: nodes[i] is the plan node,
+# name_of[i] its id, id_of maps id -> index, rank[i] the length of the
+# longest path from i to a sink (critical-path priority)
+Graph = namedtuple("Graph", ["succ", "pred", "nodes", "id_of", "name_of", "rank", "bindings"])
+
+try:
+    import re2  # google-re2: linear-time matching, no catastrophic backtracking
+except ImportError:
+    re2 = None
+
+
+def _compile(pattern: str):
+    """Compile with RE2 when installed, falling back to re"""
+    if re2 is not None:
+        try:
+            return re2.compile(pattern)
+        except Exception:
+            pass
+    return re.compile(pattern)
+
+
+# Invoice parsing patterns, compiled once at import (flags inline so RE2 accepts them)
+INVOICE_NUM_PATTERNS = (
+    _compile(r'(?i)(?:invoice|bill|no[.]?)[^\d]*(\d{4,})'),  # Account for possible punctuation like "Invoice #1234"
+    _compile(r'(?i)([A-Za-z0-9]+)[^\d]*(?:inv|invoice|bill)'),  # Handles alphanumeric invoice numbers
+)
+DATE_RE = _compile(r'\d{1,2}[/-]\d{1,2}[/-]\d{2,4}|\d{4}[-/]\d{1,2}[-/]\d{1,2}|\b(\w{3,9}\s?\d{1,2}[,\s]?\s?\d{4})\b')
+TOTAL_RE = _compile(r'(?i)(total|amount\s*due|grand\s*total)[^\d]*(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)')
+VENDOR_PATTERNS = (
+    _compile(r'(?i)(?:from|vendor|supplier)[^\w]*(\w+(?:\s\w+)*\s?(?:Inc|Ltd|LLC|Corp|GmbH|Pvt|LLP)?)'),
+    _compile(r'(?i)(?:issued\s*by|billed\s*to)\s?([A-Za-z][A-Za-z\s\.&,]+(?:Inc|Ltd|LLC|Corp|GmbH|Pvt|LLP|Company)?)'),
+)
+
+# Strips thousands separators, currency symbols and spaces from numeric cells
+_NUMBER_CLEAN = str.maketrans('', '', ',$ ')
+
+
+def _cell_number(cell: Any) -> Optional[float]:
+    """Parse a table cell as a number; None for an empty cell"""
+    if cell is None:
+        return None
+    text = str(cell).strip()
+    if not text:
+        return None
+    return float(text.translate(_NUMBER_CLEAN))
+
+
+# Node timestamps come from the monotonic clock (integer ns, never steps back)
+# shifted once onto the wall clock, so start_ms/end_ms stay epoch milliseconds
+_WALL_OFFSET_NS = time.time_ns() - time.monotonic_ns()
+
+
+def _now_ms() -> int:
+    return (time.monotonic_ns() + _WALL_OFFSET_NS) // 1_000_000
+
+
+def _extract_pages(pages) -> tuple:
+    """Text parts and tables of the given pdfplumber pages"""
+    text_parts = []
+    tables = []
+    for page in pages:
+        page_text = page.extract_text()
+        if page_text:
+            text_parts.append(page_text)
+        try:
+            page_tables = page.extract_tables()
+        except Exception as e:
+            # Don't fail the whole extraction if table extraction fails
+            logger.error(f"Error extracting tables from PDF: {str(e)}")
+            continue
+        if page_tables:
+            tables.extend(page_tables)
+    return text_parts, tables
+
+
+def _extract_page_range(pdf_content: bytes, start: int, stop: int) -> tuple:
+    """Extract pages [start, stop) of a PDF (runs in a worker process)"""
+    import pdfplumber
+    
+    with pdfplumber.open(io.BytesIO(pdf_content)) as pdf:
+        return _extract_pages(pdf.pages[start:stop])
+
+
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+
+def _get_pdf_pool() -> ProcessPoolExecutor:
+    """Process pool for large PDFs, started on first use"""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            # spawn: forking a process that runs an event loop and threads is unsafe
+            _pdf_pool = ProcessPoolExecutor(max_workers=Config.PDF_PROCESS_WORKERS,
+                                            mp_context=multiprocessing.get_context("spawn"))
+        return _pdf_pool
+
+
+def shutdown_pdf_pool():
+    """Stop the PDF worker processes, if started (on API/worker shutdown)"""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is not None:
+            _pdf_pool.shutdown(cancel_futures=True)
+            _pdf_pool = None
+
+
+_invoice_schema = None
+
+
+def _get_invoice_schema():
+    """Pydantic schema for LlamaExtract invoice agents, built on first use"""
+    global _invoice_schema
+    if _invoice_schema is None:
+        from pydantic import BaseModel, Field
+        
+        # Define the invoice data schema
+        class LineItem(BaseModel):
+            description: str = Field(default="", description="Item description")
+            quantity: float = Field(default=1.0, description="Item quantity")
+            unit_price: Optional[float] = Field(default=None, description="Unit price")
+            total: Optional[float] = Field(default=None, description="Total for this item")
+        
+        class InvoiceData(BaseModel):
+            invoice_number: str = Field(default="", description="Invoice number or ID")
+            date: str = Field(default="", description="Invoice date")
+            total_amount: Optional[float] = Field(default=None, description="Total amount due")
+            vendor: str = Field(default="", description="Vendor or seller name")
+            line_items: List[LineItem] = Field(default_factory=list, description="List of line items")
+        
+        _invoice_schema = InvoiceData
+    return _invoice_schema
+
+
+def _is_error_output(result: Any) -> bool:
+    """Tool/agent failure returned as a result, e.g. {"error": "File not found"}"""
+    if isinstance(result, (bytes, bytearray)):
+        # srv_plotly returns its error message in place of the image bytes
+        return result.startswith(b"Plotly render error:")
+    return isinstance(result, dict) and "error" in result
+
+
+class _RunState:
+    """Per-run write buffers: node DB writes and the artifact write queue"""
+    def __init__(self):
+        self.db_ops = []  # (Database method, args, kwargs)
+        self.write_queue = asyncio.Queue()  # (run_id, node_id, data, format, future)
+        self.pending_writes = {}  # node_id -> future of a write its node didn't wait for
+
 
 class Executor:
     def __init__(self, db: Database, artifacts: ArtifactManager, mcp_pool: MCPClientPool):
@@ -22,24 +185,81 @@ class Executor:
         self.mcp_pool = mcp_pool
         self.timeout_sec = 30
         self.max_retries = 1
+        self.max_parallel = Config.MAX_PARALLEL_NODES
         self._llama_api_key = os.getenv("LLAMA_CLOUD_API_KEY")
         self._has_llama = bool(self._llama_api_key)
+        # LlamaExtract client and agent, created on first use (extraction runs on worker threads)
+        self._llama_extractor = None
+        self._llama_agent = None
+        self._llama_lock = threading.Lock()
+        # LRU of idempotency key -> (run_id, artifact_uri, produced at ms) of a previous
+        # successful execution; entries older than NODE_CACHE_TTL_SEC aren't reused
+        self._node_cache = OrderedDict()
+        self._node_cache_size = Config.NODE_CACHE_SIZE
+        self._node_cache_ttl_ms = Config.NODE_CACHE_TTL_SEC * 1000
+        # Agent dispatch table (agents are implemented as simple functions)
+        self._agents = {
+            "viz_spec_agent": self._viz_spec_agent,
+            "extraction_agent": self._extraction_sync,
+            "validator": self._validator_agent,
+            "reducer": self._reducer_agent
+        }
+        # Blocking agents run in the thread pool and also get the run id
+        # (to resolve artifact references)
+        self._threaded_agents = {"extraction_agent"}
+        # Nodes whose output depends only on their args and upstream outputs, so
+        # the idempotency key identifies it. Source tools (file.read, sql.query
+        # read outside data) and side-effecting ones (tracking.upsert) always run.
+        # plotly.render is left out: it reports failures as plain bytes, not {"error": ...}
+        self._cacheable_tools = {("srv_pandas", "dataframe.transform")}
+        self._cacheable_agents = {"viz_spec_agent", "extraction_agent"}
     
-    def _build_graph(self, plan: Dict) -> nx.DiGraph:
-        """Build NetworkX graph from plan"""
-        G = nx.DiGraph()
-        
-        for node in plan["nodes"]:
-            G.add_node(node["id"], **node)
+    def _build_graph(self, plan: Dict) -> Graph:
+        """Build adjacency-list graph from plan"""
+        nodes = plan["nodes"]
+        name_of = [node["id"] for node in nodes]
+        id_of = {name: i for i, name in enumerate(name_of)}
+        succ = [[] for _ in nodes]
+        pred = [[] for _ in nodes]
         
         for source, target in plan["edges"]:
-            G.add_edge(source, target)
+            if source not in id_of or target not in id_of:
+                raise ValueError(f"Edge references unknown node: {source} -> {target}")
+            s, t = id_of[source], id_of[target]
+            if t not in succ[s]:
+                succ[s].append(t)
+                pred[t].append(s)
+        
+        # Check for cycles (Kahn: every node must eventually be released)
+        in_degree = [len(p) for p in pred]
+        queue = deque(i for i, degree in enumerate(in_degree) if degree == 0)
+        order = []
+        while queue:
+            i = queue.popleft()
+            order.append(i)
+            for j in succ[i]:
+                in_degree[j] -= 1
+                if in_degree[j] == 0:
+                    queue.append(j)
         
-        # Check for cycles
-        if not nx.is_directed_acyclic_graph(G):
+        if len(order) != len(nodes):
             raise ValueError("Plan contains cycles")
         
-        return G
+        # Longest downstream chain, filled in reverse topological order
+        rank = [1] * len(nodes)
+        for i in reversed(order):
+            if succ[i]:
+                rank[i] = 1 + max(rank[j] for j in succ[i])
+        
+        # Artifact bindings parsed once per plan: (input key, URI, producer node id)
+        bindings = [
+            [(key, ref, ref[len("artifact://"):].split("/", 1)[0])
+             for key, ref in node.get("input_bindings", {}).items()
+             if ref.startswith("artifact://")]
+            for node in nodes
+        ]
+        
+        return Graph(succ, pred, nodes, id_of, name_of, rank, bindings)
     
     def _compute_idempotency_key(self, node: Dict, upstream_hashes: list) -> str:
         """Compute idempotency key for caching"""
@@ -48,12 +268,14 @@ class Executor:
             "server": node.get("server"),
             "tool": node.get("tool"),
             "agent": node.get("agent"),
-            "args": sorted(node.get("args", {}).items()),
+            "args": node.get("args", {}),
             "upstreams": sorted(upstream_hashes)
         }
         
-        key_str = json.dumps(key_data, sort_keys=True)
-        return hashlib.sha256(key_str.encode()).hexdigest()
+        # OPT_SORT_KEYS canonicalizes nested args in C; a fast non-cryptographic
+        # digest is plenty for a cache key
+        key_bytes = orjson.dumps(key_data, option=orjson.OPT_SORT_KEYS)
+        return digest(key_bytes)
     
     async def execute(self, run_id: str, plan: Dict):
         """Execute DAG plan"""
@@ -64,24 +286,79 @@ class Executor:
             # Build graph
             graph = self._build_graph(plan)
             
-            # Store node outputs
-            node_outputs = {}
+            # Node outputs, and their hashes computed once per producer,
+            # indexed like graph.nodes
+            outputs = [None] * len(graph.nodes)
+            hashes = [None] * len(graph.nodes)
             
-            # Topological execution
-            for node_id in nx.topological_sort(graph):
-                node = graph.nodes[node_id]
-                
-                # Gather upstream outputs
-                upstream_outputs = {}
-                for pred in graph.predecessors(node_id):
-                    upstream_outputs[pred] = node_outputs.get(pred)
+            # Kahn-style scheduling: a node starts as soon as all of its
+            # upstreams are done, so independent branches run concurrently.
+            # Ready nodes are a heap on critical-path rank, so when
+            # MAX_PARALLEL_NODES caps concurrency the longest chains go first
+            in_degree = [len(p) for p in graph.pred]
+            ready = [(-graph.rank[i], i) for i, degree in enumerate(in_degree) if degree == 0]
+            heapq.heapify(ready)
+            running = {}  # task -> node index
+            limit = self.max_parallel or len(graph.nodes)
+            state = _RunState()
+            writer = asyncio.create_task(self._drain_writes(state.write_queue))
+            
+            try:
+                while ready or running:
+                    started = []
+                    while ready and len(running) + len(started) < limit:
+                        _, i = heapq.heappop(ready)
+                        # Gather upstream outputs
+                        preds = graph.pred[i]
+                        upstream_outputs = {graph.name_of[p]: outputs[p] for p in preds}
+                        upstream_hashes = [hashes[p] for p in preds if hashes[p]]
+                        start_ms, idem_key = self._start_node(state, run_id, graph.nodes[i],
+                                                              upstream_hashes)
+                        started.append((i, upstream_outputs, start_ms, idem_key))
+                    
+                    # One DB flush per round: results of the nodes that just
+                    # finished plus the start records of the ones about to run
+                    await self._flush(state)
+                    
+                    for i, upstream_outputs, start_ms, idem_key in started:
+                        task = asyncio.create_task(
+                            self._execute_node(state, run_id, graph.nodes[i], graph.bindings[i],
+                                               upstream_outputs, start_ms, idem_key)
+                        )
+                        running[task] = i
+                    
+                    done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        i = running.pop(task)
+                        output = task.result()  # re-raises node failure
+                        outputs[i] = output
+                        hashes[i] = self.artifacts.compute_hash(output) if output else None
+                        
+                        for j in graph.succ[i]:
+                            in_degree[j] -= 1
+                            if in_degree[j] == 0:
+                                heapq.heappush(ready, (-graph.rank[j], j))
                 
-                # Execute node
-                output = await self._execute_node(run_id, node, upstream_outputs)
-                node_outputs[node_id] = output
+                # Surface any deferred artifact write that failed
+                await state.write_queue.join()
+                for fut in state.pending_writes.values():
+                    fut.result()
+            finally:
+                # On failure, cancel siblings still in flight
+                for task in running:
+                    task.cancel()
+                if running:
+                    await asyncio.gather(*running, return_exceptions=True)
+                await state.write_queue.join()
+                writer.cancel()
+                for fut in state.pending_writes.values():
+                    if fut.done() and not fut.cancelled():
+                        fut.exception()  # mark retrieved
+                await self._flush(state)
             
             # Build final result
-            reduce_output = node_outputs.get("reduce", {})
+            reduce_idx = graph.id_of.get("reduce")
+            reduce_output = outputs[reduce_idx] if reduce_idx is not None else {}
             
             self.db.update_run_status(run_id, "success", result=reduce_output)
             logger.info("execution_completed", run_id=run_id)
@@ -92,45 +369,83 @@ class Executor:
             self.db.update_run_status(run_id, "failed", error=str(e))
             raise
     
-    async def _execute_node(self, run_id: str, node: Dict, upstream_outputs: Dict) -> Any:
-        """Execute single node"""
+    def _start_node(self, state: _RunState, run_id: str, node: Dict,
+                    upstream_hashes: List[str]) -> tuple:
+        """Buffer the node's start records; returns (start_ms, idempotency key)"""
         node_id = node["id"]
         node_type = node.get("type")
         
-        start_ms = int(time.time() * 1000)
+        start_ms = _now_ms()
+        logger.info("node_started", run_id=run_id, node_id=node_id, type=node_type)
+        
+        # Compute idempotency key
+        idem_key = self._compute_idempotency_key(node, upstream_hashes)
+        
+        # Create node record, already running
+        state.db_ops.append(("create_node", (run_id, node_id, node_type, idem_key),
+                             {"status": "running", "start_ms": start_ms}))
+        return start_ms, idem_key
+    
+    async def _flush(self, state: _RunState):
+        """Apply buffered node writes in one transaction, off the event loop"""
+        ops = state.db_ops
+        if not ops:
+            return
+        state.db_ops = []
+        await asyncio.to_thread(self.db.bulk_apply, ops)
+    
+    async def _drain_writes(self, queue: asyncio.Queue):
+        """Write queued artifacts in the background, resolving each write's future"""
+        while True:
+            batch = [await queue.get()]
+            while not queue.empty():
+                batch.append(queue.get_nowait())
+            try:
+                uris = await asyncio.to_thread(self.artifacts.bulk_write,
+                                               [write[:4] for write in batch])
+            except Exception as e:
+                for *_, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+            else:
+                for (*_, fut), uri in zip(batch, uris):
+                    if not fut.done():
+                        fut.set_result(uri)
+            finally:
+                for _ in batch:
+                    queue.task_done()
+    
+    async def _execute_node(self, state: _RunState, run_id: str, node: Dict, bindings: List[tuple],
+                            upstream_outputs: Dict, start_ms: int, idem_key: str) -> Any:
+        """Execute single node"""
+        node_id = node["id"]
+        node_type = node.get("type")
         
         try:
-            logger.info("node_started", run_id=run_id, node_id=node_id, type=node_type)
-            
-            # Compute idempotency key
-            upstream_hashes = [
-                self.artifacts.compute_hash(out) 
-                for out in upstream_outputs.values() if out
-            ]
-            idem_key = self._compute_idempotency_key(node, upstream_hashes)
-            
-            # Create node record
-            self.db.create_node(run_id, node_id, node_type, idem_key)
-            self.db.update_node_status(run_id, node_id, "running", start_ms=start_ms)
-            
-            # Gather inputs from bindings
-            inputs = await self._gather_inputs(run_id, node, upstream_outputs)
-            
-            # Execute with timeout
-            result = await asyncio.wait_for(
-                self._call_node(run_id, node, inputs),
-                timeout=self.timeout_sec
-            )
+            # Same pure node with the same args and upstream outputs already ran: reuse its output
+            cacheable = self._is_cacheable(node)
+            result = await self._cached_output(idem_key) if cacheable else None
+            if result is not None:
+                logger.info("node_cache_hit", run_id=run_id, node_id=node_id)
+            else:
+                # Gather inputs from bindings
+                inputs = await self._gather_inputs(state, run_id, node, bindings, upstream_outputs)
+                
+                # Execute with timeout (a loop timer, not a wrapper task like wait_for)
+                async with node_timeout(self.timeout_sec):
+                    result = await self._call_node(run_id, node, inputs)
             
-            # Save artifact
-            artifact_uri = self._save_node_output(run_id, node_id, result)
+            # Save artifact; the event loop keeps scheduling other nodes while it's written.
+            # Downstream nodes in this run get the output as stored (e.g. decoded PNG bytes)
+            artifact_uri, result = await self._save_node_output(state, run_id, node_id, result)
+            if cacheable and not _is_error_output(result):
+                self._remember_output(idem_key, run_id, artifact_uri)
             
-            end_ms = int(time.time() * 1000)
+            end_ms = _now_ms()
             
             # Update node status
-            self.db.update_node_status(run_id, node_id, "success", 
-                                      output_artifact=artifact_uri,
-                                      end_ms=end_ms)
+            state.db_ops.append(("update_node_status", (run_id, node_id, "success"),
+                                 {"output_artifact": artifact_uri, "end_ms": end_ms}))
             
             log_node_execution(run_id, node_id, node_type, "success",
                              start_ms, end_ms, artifact_uri=artifact_uri)
@@ -138,64 +453,137 @@ class Executor:
             return result
             
         except asyncio.TimeoutError:
-            end_ms = int(time.time() * 1000)
+            end_ms = _now_ms()
             error = f"Timeout after {self.timeout_sec}s"
-            self.db.update_node_status(run_id, node_id, "failed", error=error, end_ms=end_ms)
+            state.db_ops.append(("update_node_status", (run_id, node_id, "failed"),
+                                 {"error": error, "end_ms": end_ms}))
+            log_node_execution(run_id, node_id, node_type, "failed", start_ms, end_ms, error=error)
+            raise
+        
+        except asyncio.CancelledError:
+            # A sibling failed and execute() is cancelling the rest; close out the
+            # record (flushed once the cancelled tasks finish) so it isn't left running
+            end_ms = _now_ms()
+            error = "Cancelled"
+            state.db_ops.append(("update_node_status", (run_id, node_id, "failed"),
+                                 {"error": error, "end_ms": end_ms}))
             log_node_execution(run_id, node_id, node_type, "failed", start_ms, end_ms, error=error)
             raise
         
         except Exception as e:
-            end_ms = int(time.time() * 1000)
+            end_ms = _now_ms()
             error = str(e)
-            self.db.update_node_status(run_id, node_id, "failed", error=error, end_ms=end_ms)
+            state.db_ops.append(("update_node_status", (run_id, node_id, "failed"),
+                                 {"error": error, "end_ms": end_ms}))
             log_node_execution(run_id, node_id, node_type, "failed", start_ms, end_ms, error=error)
             raise
     
-    async def _gather_inputs(self, run_id: str, node: Dict, upstream_outputs: Dict) -> Dict:
+    def _is_cacheable(self, node: Dict) -> bool:
+        """Whether the node's output may be reused by idempotency key"""
+        if self._node_cache_size <= 0:
+            return False
+        if node.get("type") == "tool":
+            return (node.get("server"), node.get("tool")) in self._cacheable_tools
+        # A file reference given in args points at this run's artifacts, which the key doesn't cover
+        return node.get("agent") in self._cacheable_agents and "file_ref" not in node.get("args", {})
+    
+    async def _cached_output(self, idem_key: str) -> Any:
+        """Output of a previous execution with this idempotency key, or None"""
+        if self._node_cache_size <= 0:
+            return None
+        min_ms = _now_ms() - self._node_cache_ttl_ms
+        entry = self._node_cache.get(idem_key)
+        if entry is not None and entry[2] < min_ms:
+            del self._node_cache[idem_key]
+            entry = None
+        if entry is not None:
+            self._node_cache.move_to_end(idem_key)
+        else:
+            # Not produced in this process; a recent run (or another worker) may have
+            row = await asyncio.to_thread(self.db.get_node_by_idempotency, idem_key, min_ms)
+            if row is None or not row["output_artifact"]:
+                return None
+            entry = (row["run_id"], row["output_artifact"], row["end_ms"])
+        source_run_id, artifact_uri, _ = entry
+        try:
+            output = await asyncio.to_thread(self.artifacts.read, artifact_uri, source_run_id)
+        except (FileNotFoundError, ValueError):
+            # Source artifact is gone; forget it and execute normally
+            self._node_cache.pop(idem_key, None)
+            return None
+        if _is_error_output(output):
+            # Failure reported as a result (recorded as success); retry it
+            self._node_cache.pop(idem_key, None)
+            return None
+        return output
+    
+    def _remember_output(self, idem_key: str, run_id: str, artifact_uri: str):
+        if self._node_cache_size <= 0:
+            return
+        self._node_cache[idem_key] = (run_id, artifact_uri, _now_ms())
+        self._node_cache.move_to_end(idem_key)
+        if len(self._node_cache) > self._node_cache_size:
+            self._node_cache.popitem(last=False)
+    
+    async def _gather_inputs(self, state: _RunState, run_id: str, node: Dict,
+                             bindings: List[tuple], upstream_outputs: Dict) -> Dict:
         """Gather input artifacts for node"""
         inputs = dict(node.get("args", {}))
         
-        # Process input bindings
-        for key, ref in node.get("input_bindings", {}).items():
-            if ref.startswith("artifact://"):
-                # Load artifact
-                data = self.artifacts.read(ref, run_id)
-                inputs[key] = data
+        # Process input bindings (pre-parsed by _build_graph)
+        for key, ref, source in bindings:
+            if source in upstream_outputs:
+                # Produced earlier in this run: pass the in-memory output along
+                # instead of reading it back. Shared, not copied (see _call_node),
+                # and not JSON-normalised (a tuple arrives as a tuple, not a list)
+                inputs[key] = upstream_outputs[source]
+                continue
+            
+            # The producer may not have waited for its write; make sure it landed
+            # (shielded: this node being cancelled must not cancel the write)
+            pending = state.pending_writes.get(source)
+            if pending is not None:
+                await asyncio.shield(pending)
+            
+            # Load artifact
+            data = await asyncio.to_thread(self.artifacts.read, ref, run_id)
+            inputs[key] = data
         
         return inputs
     
     async def _call_node(self, run_id: str, node: Dict, inputs: Dict) -> Any:
         """Call tool or agent"""
+        # Tools and agents must treat inputs as read-only: an upstream output is the
+        # same object for every consumer, and the background writer may still be
+        # serialising it in another thread. Build a new value instead of mutating one
         node_type = node.get("type")
         
         if node_type == "tool":
-            # Call MCP tool
+            # Call MCP tool (blocking: in-process server or a stdio subprocess),
+            # off the event loop so sibling nodes run meanwhile
             server = node["server"]
             tool = node["tool"]
-            result = self.mcp_pool.call_tool(server, tool, inputs)
+            result = await asyncio.to_thread(self.mcp_pool.call_tool, server, tool, inputs)
             return result
         
         elif node_type == "agent":
             # Call agent (implemented as simple functions)
             agent_name = node["agent"]
-            result = await self._call_agent(agent_name, inputs)
+            result = await self._call_agent(agent_name, inputs, run_id)
             return result
         
         else:
             raise ValueError(f"Unknown node type: {node_type}")
     
-    async def _call_agent(self, agent_name: str, inputs: Dict) -> Any:
+    async def _call_agent(self, agent_name: str, inputs: Dict, run_id: Optional[str] = None) -> Any:
         """Call agent (simplified implementation)"""
-        if agent_name == "viz_spec_agent":
-            return self._viz_spec_agent(inputs)
-        elif agent_name == "extraction_agent":
-            return self._extraction_agent(inputs)
-        elif agent_name == "validator":
-            return self._validator_agent(inputs)
-        elif agent_name == "reducer":
-            return self._reducer_agent(inputs)
-        else:
+        agent = self._agents.get(agent_name)
+        if agent is None:
             raise ValueError(f"Unknown agent: {agent_name}")
+        if agent_name in self._threaded_agents:
+            # e.g. PDF parsing: run it off the event loop so other nodes keep going
+            return await asyncio.to_thread(agent, inputs, run_id)
+        return agent(inputs)
     
     def _viz_spec_agent(self, inputs: Dict) -> Dict:
         """Generate visualization spec from dataframe"""
@@ -210,7 +598,12 @@ class Executor:
         
         # Smart column selection for sales data
         x_col = "week" if "week" in cols else (cols[0] if len(cols) > 0 else "x")
-        y_col = "sales" if "sales" in cols else (cols[1] if len(cols) > 1 else "y")
+        if "sales" in cols:
+            y_col = "sales"
+        else:
+            # Otherwise plot the first numeric column, sniffed from the column dtypes
+            numeric = [c for c in pd.DataFrame(rows).select_dtypes("number").columns if c != x_col]
+            y_col = numeric[0] if numeric else (cols[1] if len(cols) > 1 else "y")
         
         return {
             "type": "plotspec",
@@ -224,128 +617,97 @@ class Executor:
             "title": f"Weekly Sales"
         }
     
+    def _get_llama_agent(self):
+        """LlamaExtract invoice agent, looked up (or created) once per process"""
+        with self._llama_lock:
+            if self._llama_agent is not None:
+                return self._llama_agent
+            
+            from llama_cloud_services import LlamaExtract
+            # Initialize LlamaExtract with API key
+            self._llama_extractor = LlamaExtract(api_key=self._llama_api_key)
+            
+            # Create or get extraction agent with schema
+            try:
+                # Try to get existing agent
+                self._llama_agent = self._llama_extractor.get_agent(name="invoice-extractor")
+            except:
+                # Create new agent if it doesn't exist
+                self._llama_agent = self._llama_extractor.create_agent(name="invoice-extractor",
+                                                                       data_schema=_get_invoice_schema())
+            return self._llama_agent
+    
     def _extract_with_llama(self, pdf_content: bytes, temp_dir: Optional[str] = None) -> dict:
         """Extract text and structured data from PDF using LlamaExtract"""
         try:
-            from llama_cloud_services import LlamaExtract
-            from pydantic import BaseModel, Field
-            
-            # Define the invoice data schema
-            class LineItem(BaseModel):
-                description: str = Field(default="", description="Item description")
-                quantity: float = Field(default=1.0, description="Item quantity")
-                unit_price: Optional[float] = Field(default=None, description="Unit price")
-                total: Optional[float] = Field(default=None, description="Total for this item")
-            
-            class InvoiceData(BaseModel):
-                invoice_number: str = Field(default="", description="Invoice number or ID")
-                date: str = Field(default="", description="Invoice date")
-                total_amount: Optional[float] = Field(default=None, description="Total amount due")
-                vendor: str = Field(default="", description="Vendor or seller name")
-                line_items: List[LineItem] = Field(default_factory=list, description="List of line items")
+            agent = self._get_llama_agent()
             
-            # Save PDF to temporary file
-            import tempfile
-            
-            # Use system temp directory if not specified
-            if temp_dir is None:
-                temp_dir = tempfile.gettempdir()
-            
-            temp_file = os.path.join(temp_dir, f"temp_pdf_{uuid.uuid4().hex}.pdf")
+            # Extract data from PDF
             try:
-                # Ensure temp directory exists
-                os.makedirs(temp_dir, exist_ok=True)
-                
-                with open(temp_file, "wb") as f:
-                    f.write(pdf_content)
-                
-                # Initialize LlamaExtract with API key
-                extractor = LlamaExtract(api_key=self._llama_api_key)
-                
-                # Create or get extraction agent with schema
+                from llama_cloud_services import SourceText
+            except ImportError:
+                SourceText = None
+            
+            if SourceText is not None:
+                # Upload straight from memory, no temp file round trip
+                result = agent.extract(SourceText(file=pdf_content, filename="invoice.pdf"))
+            else:
+                # Older SDKs only take paths; mkstemp creates and opens the file in one call
+                if temp_dir is not None:
+                    os.makedirs(temp_dir, exist_ok=True)
+                fd, temp_file = tempfile.mkstemp(prefix="temp_pdf_", suffix=".pdf", dir=temp_dir)
                 try:
-                    # Try to get existing agent
-                    agent = extractor.get_agent(name="invoice-extractor")
-                except:
-                    # Create new agent if it doesn't exist
-                    agent = extractor.create_agent(name="invoice-extractor", data_schema=InvoiceData)
-                
-                # Extract data from PDF
-                result = agent.extract(temp_file)
-                
-                # Return structured data
-                if hasattr(result, 'data') and result.data:
-                    text = json.dumps(result.data, indent=2)
-                    return {"text": text, "structured_data": result.data}
-                else:
-                    text = str(result)
-                    return {"text": text, "structured_data": None}
-                
-            finally:
-                # Clean up temp file
-                if os.path.exists(temp_file):
+                    with os.fdopen(fd, "wb") as f:
+                        f.write(pdf_content)
+                    result = agent.extract(temp_file)
+                finally:
+                    # Clean up temp file
                     os.remove(temp_file)
+            
+            # Return structured data
+            if hasattr(result, 'data') and result.data:
+                text = json.dumps(result.data, indent=2)
+                return {"text": text, "structured_data": result.data}
+            else:
+                text = str(result)
+                return {"text": text, "structured_data": None}
                     
         except Exception as e:
             logger.error(f"Error with LlamaExtract: {str(e)}")
+            # Look the agent up again next time in case it went stale
+            with self._llama_lock:
+                self._llama_agent = None
             raise
     
-    def _extract_text_from_pdf(self, pdf_content: bytes) -> str:
-        """Extract text from PDF content using hybrid approach"""
-        # Try LlamaExtract first if API key is available
-        if self._has_llama:
-            try:
-                result = self._extract_with_llama(pdf_content)
-                return result.get("text", "")
-            except Exception as e:
-                logger.warning(f"LlamaExtract failed, falling back to pdfplumber: {str(e)}")
-        
-        # Fallback to pdfplumber
+    def _extract_pdf(self, pdf_content: bytes) -> tuple:
+        """Extract text and tables from PDF content in a single pdfplumber pass"""
         import pdfplumber
-        import io
         
-        text = ""
+        text_parts = []
+        tables = []
         try:
             with pdfplumber.open(io.BytesIO(pdf_content)) as pdf:
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n\n"
+                page_count = len(pdf.pages)
+                parallel = 0 < Config.PDF_PROCESS_PAGES <= page_count
+                if not parallel:
+                    text_parts, tables = _extract_pages(pdf.pages)
+            
+            if parallel:
+                # Large PDF: split the pages into one contiguous range per worker
+                pool = _get_pdf_pool()
+                step = -(-page_count // Config.PDF_PROCESS_WORKERS)
+                futures = [pool.submit(_extract_page_range, pdf_content, start,
+                                       min(start + step, page_count))
+                           for start in range(0, page_count, step)]
+                for future in futures:
+                    range_text, range_tables = future.result()
+                    text_parts.extend(range_text)
+                    tables.extend(range_tables)
         except Exception as e:
             logger.error(f"Error extracting text from PDF: {str(e)}")
             raise ValueError(f"Failed to extract text from PDF: {str(e)}")
         
-        return text.strip()
-    
-    def _extract_tables_from_pdf(self, pdf_content: bytes) -> list:
-        """Extract tables from PDF content using hybrid approach"""
-        # Try LlamaExtract first if API key is available
-        if self._has_llama:
-            try:
-                result = self._extract_with_llama(pdf_content)
-                structured = result.get("structured_data")
-                if structured:
-                    # Convert structured data to table format if possible
-                    return [structured] if isinstance(structured, dict) else structured if isinstance(structured, list) else []
-            except Exception as e:
-                logger.warning(f"LlamaExtract failed, falling back to pdfplumber: {str(e)}")
-        
-        # Fallback to pdfplumber
-        import pdfplumber
-        import io
-        
-        tables = []
-        try:
-            with pdfplumber.open(io.BytesIO(pdf_content)) as pdf:
-                for page in pdf.pages:
-                    page_tables = page.extract_tables()
-                    if page_tables:
-                        tables.extend(page_tables)
-        except Exception as e:
-            logger.error(f"Error extracting tables from PDF: {str(e)}")
-            # Don't fail the whole extraction if table extraction fails
-            
-        return tables
+        return "\n\n".join(text_parts).strip(), tables
     
     def _parse_invoice_data(self, text: str, tables: list) -> Dict:
         """Parse invoice data from extracted text and tables with improved flexibility"""
@@ -359,19 +721,15 @@ class Executor:
         }
         
         # Expanded regex patterns for invoice number
-        invoice_num_patterns = [
-            r'(?:invoice|bill|no[.]?)[^\d]*(\d{4,})',  # Account for possible punctuation like "Invoice #1234"
-            r'([A-Za-z0-9]+)[^\d]*(?:inv|invoice|bill)',  # Handles alphanumeric invoice numbers
-        ]
-        for pattern in invoice_num_patterns:
-            invoice_num_match = re.search(pattern, text, re.IGNORECASE)
+        for pattern in INVOICE_NUM_PATTERNS:
+            invoice_num_match = pattern.search(text)
             if invoice_num_match:
                 result["invoice_number"] = invoice_num_match.group(1)
                 break
         
         # Flexible date parsing with dateutil.parser (handles multiple formats)
         try:
-            date_match = re.search(r'\d{1,2}[/-]\d{1,2}[/-]\d{2,4}|\d{4}[-/]\d{1,2}[-/]\d{1,2}|\b(\w{3,9}\s?\d{1,2}[,\s]?\s?\d{4})\b', text)
+            date_match = DATE_RE.search(text)
             if date_match:
                 date_str = date_match.group(0)
                 result["date"] = parser.parse(date_str).strftime('%Y-%m-%d')
@@ -379,7 +737,7 @@ class Executor:
             result["date"] = "Not found"
         
         # Expanded total amount regex to cover more variations
-        total_matches = re.findall(r'(?i)(total|amount\s*due|grand\s*total)[^\d]*(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)', text)
+        total_matches = TOTAL_RE.findall(text)
         if total_matches:
             try:
                 total_value = total_matches[-1][1].replace(',', '')
@@ -388,12 +746,8 @@ class Executor:
                 result["total_amount"] = None
         
         # Flexible vendor matching with multiple labels
-        vendor_patterns = [
-            r'(?:from|vendor|supplier)[^\w]*(\w+(?:\s\w+)*\s?(?:Inc|Ltd|LLC|Corp|GmbH|Pvt|LLP)?)',
-            r'(?:issued\s*by|billed\s*to)\s?([A-Za-z][A-Za-z\s\.&,]+(?:Inc|Ltd|LLC|Corp|GmbH|Pvt|LLP|Company)?)'
-        ]
-        for pattern in vendor_patterns:
-            vendor_match = re.search(pattern, text, re.IGNORECASE)
+        for pattern in VENDOR_PATTERNS:
+            vendor_match = pattern.search(text)
             if vendor_match:
                 result["vendor"] = vendor_match.group(1).strip()
                 break
@@ -403,47 +757,74 @@ class Executor:
             if len(table) > 1:  # At least header + one row
                 headers = [str(cell or '').lower().strip() for cell in table[0]]
                 
-                # Try to identify columns with more flexibility
-                item_col = next((i for i, h in enumerate(headers) if any(term in h for term in ['item', 'description', 'product'])), -1)
-                qty_col = next((i for i, h in enumerate(headers) if any(term in h for term in ['qty', 'quantity', 'count'])), -1)
-                price_col = next((i for i, h in enumerate(headers) if any(term in h for term in ['price', 'unit price', 'rate'])), -1)
-                total_col = next((i for i, h in enumerate(headers) if any(term in h for term in ['total', 'amount', 'cost'])), -1)
+                # Try to identify columns with more flexibility, in one pass over the
+                # headers; each column takes the first header that matches it
+                item_col = qty_col = price_col = total_col = -1
+                for i, h in enumerate(headers):
+                    if item_col < 0 and ('item' in h or 'description' in h or 'product' in h):
+                        item_col = i
+                    if qty_col < 0 and ('qty' in h or 'quantity' in h or 'count' in h):
+                        qty_col = i
+                    if price_col < 0 and ('price' in h or 'rate' in h):
+                        price_col = i
+                    if total_col < 0 and ('total' in h or 'amount' in h or 'cost' in h):
+                        total_col = i
+                    if item_col >= 0 and qty_col >= 0 and price_col >= 0 and total_col >= 0:
+                        break
                 
                 # If relevant columns are found, extract line items
                 if item_col >= 0 and (price_col >= 0 or total_col >= 0):
+                    max_col = max(item_col, qty_col, price_col, total_col)
                     for row in table[1:]:  # Skip header
+                        if len(row) <= max_col or not any(row):
+                            continue
                         try:
-                            if len(row) > max(item_col, qty_col, price_col, total_col):
-                                line_item = {
-                                    "description": str(row[item_col]) if item_col < len(row) else "",
-                                    "quantity": float(row[qty_col]) if qty_col >= 0 and qty_col < len(row) and str(row[qty_col]).strip() else 1,
-                                    "unit_price": float(str(row[price_col]).replace(',', '')) if price_col >= 0 and price_col < len(row) and str(row[price_col]).strip() else None,
-                                    "total": float(str(row[total_col]).replace(',', '')) if total_col >= 0 and total_col < len(row) and str(row[total_col]).strip() else None
-                                }
-                                result["line_items"].append(line_item)
-                        except (ValueError, IndexError):
+                            quantity = _cell_number(row[qty_col]) if qty_col >= 0 else None
+                            line_item = {
+                                "description": str(row[item_col]),
+                                "quantity": 1 if quantity is None else quantity,
+                                "unit_price": _cell_number(row[price_col]) if price_col >= 0 else None,
+                                "total": _cell_number(row[total_col]) if total_col >= 0 else None
+                            }
+                        except ValueError:
                             continue
+                        result["line_items"].append(line_item)
                     
                     # If line items are found, no need to process more tables
                     if result["line_items"]:
                         break
 
         return result
-    def _extraction_agent(self, inputs: Dict) -> Dict:
-        """Extract structured data from PDF content using hybrid approach"""
+    
+    def _pdf_bytes(self, file_ref: Dict, run_id: Optional[str] = None) -> bytes:
+        """Raw PDF bytes from a file reference: inline bytes, an artifact URI, or base64"""
+        raw = file_ref.get("bytes")
+        if raw is not None:
+            return raw if isinstance(raw, bytes) else bytes(raw)
+        
+        uri = file_ref.get("uri")
+        if uri:
+            if run_id is None:
+                raise ValueError("Artifact file reference requires a run")
+            data = self.artifacts.read(uri, run_id)
+            # A JSON artifact is itself a file reference (e.g. file.read output)
+            return self._pdf_bytes(data) if isinstance(data, dict) else data
+        
+        # b64decode takes str or bytes, so no intermediate encode is needed
+        pdf_base64 = file_ref.get("bytes_base64")
+        if not pdf_base64:
+            raise ValueError("No PDF content found in file reference")
+        return base64.b64decode(pdf_base64)
+    
+    def _extraction_sync(self, inputs: Dict, run_id: Optional[str] = None) -> Dict:
+        """Extract structured data from PDF content using hybrid approach (blocking)"""
         try:
             # Get the file reference from inputs
             file_ref = inputs.get("file_ref", {})
             if not file_ref:
                 raise ValueError("No file reference provided")
             
-            # Get the base64-encoded PDF content
-            pdf_base64 = file_ref.get("bytes_base64")
-            if not pdf_base64:
-                raise ValueError("No PDF content found in file reference")
-            
-            # Decode the base64 content
-            pdf_content = base64.b64decode(pdf_base64)
+            pdf_content = self._pdf_bytes(file_ref, run_id)
             
             # Try LlamaExtract first if API key is available
             extraction_method = "pdfplumber"
@@ -467,8 +848,7 @@ class Executor:
             
             # Use pdfplumber if LlamaExtract wasn't successful
             if not result or extraction_method.startswith("pdfplumber"):
-                text = self._extract_text_from_pdf(pdf_content)
-                tables = self._extract_tables_from_pdf(pdf_content)
+                text, tables = self._extract_pdf(pdf_content)
                 
                 # Parse the extracted data
                 result = self._parse_invoice_data(text, tables)
@@ -534,8 +914,8 @@ class Executor:
             "artifacts": []  # Will be populated by caller
         }
     
-    def _save_node_output(self, run_id: str, node_id: str, result: Any) -> str:
-        """Save node output as artifact"""
+    async def _save_node_output(self, state: _RunState, run_id: str, node_id: str, result: Any) -> tuple:
+        """Queue node output as artifact; returns (URI, stored output)"""
         # Determine format
         if isinstance(result, bytes):
             format = "png"
@@ -543,7 +923,6 @@ class Executor:
             # Check if it's a plotly stdio response that wasn't converted
             if "image_base64" in result:
                 # Convert base64 to bytes for consistency
-                import base64
                 result = base64.b64decode(result["image_base64"])
                 format = "png"
             elif "rows" in result:
@@ -553,4 +932,13 @@ class Executor:
         else:
             format = "json"
         
-        return self.artifacts.write(run_id, node_id, result, format=format)
+        fut = asyncio.get_running_loop().create_future()
+        await state.write_queue.put((run_id, node_id, result, format, fut))
+        if node_id == "reduce":
+            # Final output: the run isn't done until it's on disk
+            return await fut, result
+        
+        # Intermediate output: don't hold the node on disk I/O; consumers wait
+        # for the write in _gather_inputs and execute() joins the queue
+        state.pending_writes[node_id] = fut
+        return self.artifacts.make_uri(node_id, format), result
@@ -1,125 +1,144 @@
-import json
+import os
+from functools import lru_cache
 from typing import Dict, List
-import uuid
+import orjson
 from app.config import Config
-from pathlib import Path
-from datetime import datetime, timedelta
+from app.util.fastid import short_id
+
+# DAG templates, shared by every Planner (plans never mutate template nodes)
+_TEMPLATES = {
+    "flow_plot": {
+        "nodes": [
+            {
+                "id": "sql",
+                "type": "tool",
+                "server": "srv_sql",
+                "tool": "sql.query",
+                "args": {"sql": "1=1"}  # Will be replaced
+            },
+            {
+                "id": "tfm",
+                "type": "tool",
+                "server": "srv_pandas",
+                "tool": "dataframe.transform",
+                "args": {"script": "head(20)"},
+                "input_bindings": {"dataframe_data": "artifact://sql/output.json"}
+            },
+            {
+                "id": "spec",
+                "type": "agent",
+                "agent": "viz_spec_agent",
+                "input_bindings": {"dataframe_data": "artifact://tfm/output.json"}
+            },
+            {
+                "id": "render",
+                "type": "tool",
+                "server": "srv_plotly",
+                "tool": "plotly.render",
+                "args": {"format": "png"},
+                "input_bindings": {"spec": "artifact://spec/output.json"}
+            },
+            {
+                "id": "validate",
+                "type": "agent",
+                "agent": "validator",
+                "input_bindings": {"image_ref": "artifact://render/output.png"}
+            },
+            {
+                "id": "reduce",
+                "type": "agent",
+                "agent": "reducer",
+                "args": {"type": "plot"}
+            }
+        ],
+        "edges": [
+            ["sql", "tfm"],
+            ["tfm", "spec"],
+            ["spec", "render"],
+            ["render", "validate"],
+            ["validate", "reduce"]
+        ]
+    },
+    "flow_pdf_tracking": {
+        "nodes": [
+            {
+                "id": "read",
+                "type": "tool",
+                "server": "srv_fs",
+                "tool": "file.read",
+                "args": {"path": "./samples/sample1-pdf.pdf"}
+            },
+            {
+                "id": "extract",
+                "type": "agent",
+                "agent": "extraction_agent",
+                "input_bindings": {"file_ref": "artifact://read/output.json"}
+            },
+            {
+                "id": "upsert",
+                "type": "tool",
+                "server": "srv_tracking",
+                "tool": "tracking.upsert",
+                "input_bindings": {"fields": "artifact://extract/output.json"}
+            },
+            {
+                "id": "validate",
+                "type": "agent",
+                "agent": "validator",
+                "input_bindings": {"tracking_ref": "artifact://upsert/output.json"}
+            },
+            {
+                "id": "reduce",
+                "type": "agent",
+                "agent": "reducer",
+                "args": {"type": "file_update"}
+            }
+        ],
+        "edges": [
+            ["read", "extract"],
+            ["extract", "upsert"],
+            ["upsert", "validate"],
+            ["validate", "reduce"]
+        ]
+    }
+}
+
+# Node id -> position in each template's node list
+_NODE_INDEX = {
+    name: {node["id"]: i for i, node in enumerate(t["nodes"])}
+    for name, t in _TEMPLATES.items()
+}
+
+
+@lru_cache(maxsize=4)
+def _read_capability_index(path: str, mtime: float) -> Dict:
+    """Parse a capability index file; cached until the file changes"""
+    with open(path, 'rb') as f:
+        return orjson.loads(f.read())
+
 
 class Planner:
     def __init__(self):
-        self.templates = self._load_templates()
+        self.templates = _TEMPLATES
+        self._node_index = _NODE_INDEX
+        self._customizers = {
+            "flow_plot": self._customize_flow_plot,
+            "flow_pdf_tracking": self._customize_flow_pdf_tracking
+        }
         self.capability_index = self._load_capability_index()
     
     def _load_capability_index(self) -> Dict:
         """Load capability index for dynamic planning"""
-        index_path = Path(Config.CAPABILITY_INDEX_PATH)
-        if index_path.exists():
-            with open(index_path, 'r') as f:
-                return json.load(f)
-        return {"capabilities": []}
-    
-    def _load_templates(self) -> Dict:
-        """Load DAG templates"""
-        return {
-            "flow_plot": {
-                "nodes": [
-                    {
-                        "id": "sql",
-                        "type": "tool",
-                        "server": "srv_sql",
-                        "tool": "sql.query",
-                        "args": {"sql": "1=1"}  # Will be replaced
-                    },
-                    {
-                        "id": "tfm",
-                        "type": "tool",
-                        "server": "srv_pandas",
-                        "tool": "dataframe.transform",
-                        "args": {"script": "head(20)"},
-                        "input_bindings": {"dataframe_data": "artifact://sql/output.json"}
-                    },
-                    {
-                        "id": "spec",
-                        "type": "agent",
-                        "agent": "viz_spec_agent",
-                        "input_bindings": {"dataframe_data": "artifact://tfm/output.json"}
-                    },
-                    {
-                        "id": "render",
-                        "type": "tool",
-                        "server": "srv_plotly",
-                        "tool": "plotly.render",
-                        "args": {"format": "png"},
-                        "input_bindings": {"spec": "artifact://spec/output.json"}
-                    },
-                    {
-                        "id": "validate",
-                        "type": "agent",
-                        "agent": "validator",
-                        "input_bindings": {"image_ref": "artifact://render/output.png"}
-                    },
-                    {
-                        "id": "reduce",
-                        "type": "agent",
-                        "agent": "reducer",
-                        "args": {"type": "plot"}
-                    }
-                ],
-                "edges": [
-                    ["sql", "tfm"],
-                    ["tfm", "spec"],
-                    ["spec", "render"],
-                    ["render", "validate"],
-                    ["validate", "reduce"]
-                ]
-            },
-            "flow_pdf_tracking": {
-                "nodes": [
-                    {
-                        "id": "read",
-                        "type": "tool",
-                        "server": "srv_fs",
-                        "tool": "file.read",
-                        "args": {"path": "./samples/sample1-pdf.pdf"}
-                    },
-                    {
-                        "id": "extract",
-                        "type": "agent",
-                        "agent": "extraction_agent",
-                        "input_bindings": {"file_ref": "artifact://read/output.json"}
-                    },
-                    {
-                        "id": "upsert",
-                        "type": "tool",
-                        "server": "srv_tracking",
-                        "tool": "tracking.upsert",
-                        "input_bindings": {"fields": "artifact://extract/output.json"}
-                    },
-                    {
-                        "id": "validate",
-                        "type": "agent",
-                        "agent": "validator",
-                        "input_bindings": {"tracking_ref": "artifact://upsert/output.json"}
-                    },
-                    {
-                        "id": "reduce",
-                        "type": "agent",
-                        "agent": "reducer",
-                        "args": {"type": "file_update"}
-                    }
-                ],
-                "edges": [
-                    ["read", "extract"],
-                    ["extract", "upsert"],
-                    ["upsert", "validate"],
-                    ["validate", "reduce"]
-                ]
-            }
-        }
+        index_path = Config.CAPABILITY_INDEX_PATH
+        try:
+            mtime = os.path.getmtime(index_path)
+        except OSError:
+            return {"capabilities": []}
+        return _read_capability_index(index_path, mtime)
     
     def plan(self, flow_type: str, query: str, context: Dict) -> Dict:
         """Build DAG plan - template-based or dynamic"""
-        plan_id = f"pln_{uuid.uuid4().hex[:8]}"
+        plan_id = "pln_" + short_id()
         
         if flow_type == "flow_dynamic":
             result = self._build_dynamic_plan(plan_id, query, context)
@@ -132,63 +151,50 @@ class Planner:
     
     def _build_template_plan(self, plan_id: str, flow_type: str, context: Dict) -> Dict:
         """Build plan from predefined template"""
+        # Plans share the template's nodes and edges (plans are read-only once
+        # built); the flow's customizer replaces just the nodes it changes
         template = self.templates[flow_type]
-        
-        # Deep copy template
-        plan = json.loads(json.dumps(template))
-        
-        if flow_type == "flow_plot":
-            sql_conditions = []
-            
-            outlet = context.get("outlet")
-            if outlet:
-                sql_conditions.append(f"outlet_id = {outlet}")
-            
-            week_count = context.get("week_count")
-            
-            # Don't filter in SQL if we have week_count - let pandas tail() handle it
-            # This ensures we get the LAST N weeks from the data
-            if not week_count:
-                # Only apply SQL date filtering if no week_count specified
-                if sql_conditions:
-                    sql_where = " AND ".join(sql_conditions)
-                else:
-                    sql_where = "1=1"
-            else:
-                # Just apply outlet filter in SQL, let pandas handle week limiting
-                if sql_conditions:
-                    sql_where = " AND ".join(sql_conditions)
-                else:
-                    sql_where = "1=1"
-            
-            sql_node = next(n for n in plan["nodes"] if n["id"] == "sql")
-            sql_node["args"]["sql"] = sql_where
-            
-            # Update pandas transform to use tail(n) for last N weeks
-            tfm_node = next(n for n in plan["nodes"] if n["id"] == "tfm")
-            if week_count:
-                tfm_node["args"]["script"] = f"tail({week_count})"
-            else:
-                tfm_node["args"]["script"] = "head(20)"
-        
-        elif flow_type == "flow_pdf_tracking":
-            # Update file path
-            file_path = context.get("file_path")
-            if file_path:
-                read_node = next(n for n in plan["nodes"] if n["id"] == "read")
-                read_node["args"]["path"] = file_path
-            else:
-                read_node = next(n for n in plan["nodes"] if n["id"] == "read")
-                read_node["args"]["path"] = "./samples/sample1-pdf.pdf"
+        nodes = list(template["nodes"])
+        customize = self._customizers.get(flow_type)
+        if customize:
+            customize(nodes, self._node_index[flow_type], context)
         
         return {
             "plan_id": plan_id,
             "flow_type": flow_type,
-            "nodes": plan["nodes"],
-            "edges": plan["edges"],
+            "nodes": nodes,
+            "edges": template["edges"],
             "budgets": {"latency_ms": 30000, "cost_usd": 1.5}
         }
     
+    def _override_args(self, nodes: List[Dict], i: int, **args):
+        """Replace a template node with a copy that has updated args"""
+        node = nodes[i]
+        nodes[i] = {**node, "args": {**node.get("args", {}), **args}}
+    
+    def _customize_flow_plot(self, nodes: List[Dict], index: Dict[str, int], context: Dict):
+        """Apply outlet filter and week window to the plot flow"""
+        sql_conditions = []
+        
+        outlet = context.get("outlet")
+        if outlet:
+            sql_conditions.append(f"outlet_id = {outlet}")
+        
+        # Only the outlet filter goes in SQL; with week_count, pandas tail()
+        # picks the LAST N weeks from the data
+        self._override_args(nodes, index["sql"], sql=" AND ".join(sql_conditions) or "1=1")
+        
+        # Update pandas transform to use tail(n) for last N weeks
+        week_count = context.get("week_count")
+        if week_count:
+            self._override_args(nodes, index["tfm"], script=f"tail({week_count})")
+        else:
+            self._override_args(nodes, index["tfm"], script="head(20)")
+    
+    def _customize_flow_pdf_tracking(self, nodes: List[Dict], index: Dict[str, int], context: Dict):
+        """Point the PDF flow at the uploaded file"""
+        self._override_args(nodes, index["read"], path=context.get("file_path") or "./samples/sample1-pdf.pdf")
+    
     def _build_dynamic_plan(self, plan_id: str, query: str, context: Dict) -> Dict:
         """Build DAG dynamically from capability index"""
         candidates = context.get("candidates", [])
@@ -1,145 +1,198 @@
-import json
+import heapq
+import re
+from collections import OrderedDict, defaultdict
 from pathlib import Path
 from typing import Dict, Tuple
+import orjson
 from app.config import Config
 
+# Words of a lowercased query, without attached punctuation ("sales," -> "sales")
+_TOKEN_RE = re.compile(r'\w+')
+# "outlet <n>" in the lowercased query, also as "outlet: 5" or "outlet #5,"; the last mention
+# wins. Unsigned whole numbers only, and not the count in "by outlet: 8 weeks"
+_OUTLET_RE = re.compile(r'\boutlet[\s:#,]+(\d+)\b(?!\.\d)(?!\s*weeks?\b)')
+_WEEK_RE = re.compile(r'(?:last|past)?\s*(\d+)\s*weeks?')
+
+# Strong intent keywords, matched anywhere in the lowercased query ("visualiz" covers -e/-ation)
+_VIZ_KEYWORDS_RE = re.compile("plot|chart|graph|visualiz|render|show|display")
+_DOC_KEYWORDS_RE = re.compile("pdf|document|invoice|extract|upload|file|process")
+
+# Capability categories by tag, as bits of a per-capability mask
+_VIZ, _DATA, _DOC = 1, 2, 4
+_CATEGORY_TAGS = (
+    (_VIZ, frozenset({"plot", "chart", "visualization", "render"})),
+    (_DATA, frozenset({"sql", "data", "query", "dataframe", "transform"})),
+    (_DOC, frozenset({"extract", "parse", "pdf", "invoice"})),
+)
+# Mask -> its candidate's (viz, data, doc) tally increments, one byte each
+# (viz << 16 | data << 8 | doc); top-5 totals stay far below a byte
+_MASK_COUNTS = tuple(
+    (2 if m & _VIZ else 0) << 16 | (2 if m & _DATA else 0) << 8 | (2 if m & _DOC else 0)
+    for m in range(8)
+)
+
+# Tag sets for the _has_*_intent checks
+_INTENT_VIZ_TAGS = frozenset({"plot", "chart", "visualization", "render", "image"})
+_INTENT_DATA_TAGS = frozenset({"sql", "data", "sales", "orders"})
+_INTENT_DOC_TAGS = frozenset({"pdf", "extract", "document", "invoice"})
+_INTENT_FILE_TAGS = frozenset({"file", "upload"})
+
+# Capability index used when no index file exists
+_DEFAULT_INDEX = {
+    "capabilities": [
+        {
+            "id": "sql",
+            "type": "tool",
+            "server": "srv_sql",
+            "tool": "sql.query",
+            "tags": ["data", "query", "sql", "sales"],
+            "description": "Execute SQL queries on CSV data"
+        },
+        {
+            "id": "pandas",
+            "type": "tool",
+            "server": "srv_pandas",
+            "tool": "dataframe.transform",
+            "tags": ["transform", "dataframe", "rolling"],
+            "description": "Transform dataframes"
+        },
+        {
+            "id": "plotly",
+            "type": "tool",
+            "server": "srv_plotly",
+            "tool": "plotly.render",
+            "tags": ["plot", "chart", "visualization"],
+            "description": "Render charts"
+        },
+        {
+            "id": "filesystem",
+            "type": "tool",
+            "server": "srv_fs",
+            "tool": "file.read",
+            "tags": ["file", "read", "pdf", "upload"],
+            "description": "Read files"
+        },
+        {
+            "id": "tracking",
+            "type": "tool",
+            "server": "srv_tracking",
+            "tool": "tracking.upsert",
+            "tags": ["tracking", "update", "invoice"],
+            "description": "Update tracking records"
+        }
+    ]
+}
+
 class Router:
     def __init__(self, capability_index_path: str = None):
         self.index = self._load_index(capability_index_path or Config.CAPABILITY_INDEX_PATH)
+        # Search structures, prepared once: tag -> positions of the capabilities
+        # listing it, and each capability's lowercased description
+        self._capabilities = self.index["capabilities"]
+        self._tag_postings = defaultdict(list)
+        for i, cap in enumerate(self._capabilities):
+            for tag in cap["tags"]:
+                self._tag_postings[tag].append(i)
+        self._descriptions = [cap["description"].lower() for cap in self._capabilities]
+        self._category_masks = [
+            sum(bit for bit, tags in _CATEGORY_TAGS if not tags.isdisjoint(cap.get("tags", ())))
+            for cap in self._capabilities
+        ]
+        # LRU of (normalized query, file path) -> (flow_type, context)
+        self._route_cache = OrderedDict()
+        self._route_cache_size = Config.ROUTE_CACHE_SIZE
     
     def _load_index(self, path: str) -> Dict:
         """Load capability index"""
         index_path = Path(path)
         if index_path.exists():
-            with open(index_path, 'r') as f:
-                return json.load(f)
-        
-        # Default index if file doesn't exist
-        return {
-            "capabilities": [
-                {
-                    "id": "sql",
-                    "type": "tool",
-                    "server": "srv_sql",
-                    "tool": "sql.query",
-                    "tags": ["data", "query", "sql", "sales"],
-                    "description": "Execute SQL queries on CSV data"
-                },
-                {
-                    "id": "pandas",
-                    "type": "tool",
-                    "server": "srv_pandas",
-                    "tool": "dataframe.transform",
-                    "tags": ["transform", "dataframe", "rolling"],
-                    "description": "Transform dataframes"
-                },
-                {
-                    "id": "plotly",
-                    "type": "tool",
-                    "server": "srv_plotly",
-                    "tool": "plotly.render",
-                    "tags": ["plot", "chart", "visualization"],
-                    "description": "Render charts"
-                },
-                {
-                    "id": "filesystem",
-                    "type": "tool",
-                    "server": "srv_fs",
-                    "tool": "file.read",
-                    "tags": ["file", "read", "pdf", "upload"],
-                    "description": "Read files"
-                },
-                {
-                    "id": "tracking",
-                    "type": "tool",
-                    "server": "srv_tracking",
-                    "tool": "tracking.upsert",
-                    "tags": ["tracking", "update", "invoice"],
-                    "description": "Update tracking records"
-                }
-            ]
-        }
+            return orjson.loads(index_path.read_bytes())
+        
+        # Default index if file doesn't exist (shared; never mutated)
+        return _DEFAULT_INDEX
     
     def route(self, query: str, file_path: str = None) -> Tuple[str, Dict]:
         """
         Classify query using capability index and return flow type
         Returns: (flow_type, context)
         """
-        candidates = self.search_capabilities(query, top_k=10)
+        # Lowercased once for every routing step; routing ignores case and
+        # surrounding whitespace, so such variants also share a cache entry
+        query_lower = query.strip().lower()
+        if self._route_cache_size <= 0:
+            return self._route(query_lower, file_path)
+        
+        key = (query_lower, file_path)
+        entry = self._route_cache.get(key)
+        if entry is not None:
+            self._route_cache.move_to_end(key)
+        else:
+            entry = self._route(query_lower, file_path)
+            self._route_cache[key] = entry
+            if len(self._route_cache) > self._route_cache_size:
+                self._route_cache.popitem(last=False)
+        
+        # Callers get their own context dict
+        flow_type, context = entry
+        return flow_type, dict(context)
+    
+    def _route(self, query_lower: str, file_path: str = None) -> Tuple[str, Dict]:
+        """Uncached route() for an already lowercased query"""
+        top = self._search(query_lower, top_k=10)
         
-        if not candidates:
+        if not top:
             return "flow_custom", {}
         
-        context = self._extract_context(query, file_path)
-        flow_type = self._classify_flow_from_candidates(candidates, query, file_path)
+        context = self._extract_context(query_lower, file_path)
+        masks = [self._category_masks[i] for i in top[:5]]  # Top 5 candidates
+        flow_type = self._classify_flow_from_candidates(masks, query_lower, file_path)
         
         if flow_type == "flow_dynamic":
-            context["candidates"] = candidates
+            context["candidates"] = [self._capabilities[i] for i in top]
         
         return flow_type, context
     
-    def _classify_flow_from_candidates(self, candidates: list, query: str, file_path: str = None) -> str:
+    def _classify_flow_from_candidates(self, candidate_masks: list, query_lower: str,
+                                       file_path: str = None) -> str:
         """
-        Classify flow type based on capability candidates and query analysis
+        Classify flow type based on capability candidates' category masks and query analysis
         """
-        query_lower = query.lower()
-        
-        # Strong indicators for specific flows
-        viz_keywords = ["plot", "chart", "graph", "visualiz", "render", "show", "display"]
-        doc_keywords = ["pdf", "document", "invoice", "extract", "upload", "file", "process"]
-        
         # Check for explicit visualization intent in query
-        has_viz_keyword = any(keyword in query_lower for keyword in viz_keywords)
+        has_viz_keyword = _VIZ_KEYWORDS_RE.search(query_lower) is not None
         
         # Check for explicit document processing intent in query  
-        has_doc_keyword = any(keyword in query_lower for keyword in doc_keywords)
+        has_doc_keyword = _DOC_KEYWORDS_RE.search(query_lower) is not None
         
         # Analyze candidate capabilities
-        candidate_types = {"viz": 0, "data": 0, "doc": 0, "file": 0}
-        
-        for candidate in candidates[:5]:  # Top 5 candidates
-            tags = set(candidate.get("tags", []))
-            
-            # Count visualization capabilities
-            if tags.intersection({"plot", "chart", "visualization", "render"}):
-                candidate_types["viz"] += 2
-            
-            # Count data processing capabilities  
-            if tags.intersection({"sql", "data", "query", "dataframe", "transform"}):
-                candidate_types["data"] += 2
-                
-            # Count document processing capabilities
-            if tags.intersection({"extract", "parse", "pdf", "invoice"}):
-                candidate_types["doc"] += 2
-                
-            # Count file operations
-            if tags.intersection({"file", "read", "upload"}):
-                candidate_types["file"] += 1
+        # (2 per candidate for each of visualization, data processing and
+        # document processing it covers)
+        counts = sum(_MASK_COUNTS[mask] for mask in candidate_masks)
+        viz, data, doc = counts >> 16, (counts >> 8) & 0xFF, counts & 0xFF
         
         # Decision logic with priority
         
         # 1. File provided + document keywords = PDF tracking flow
-        if file_path and (has_doc_keyword or candidate_types["doc"] > 0):
+        if file_path and (has_doc_keyword or doc > 0):
             return "flow_pdf_tracking"
             
         # 2. Strong visualization intent = plot flow
-        if has_viz_keyword and (candidate_types["viz"] > 0 or candidate_types["data"] > 0):
+        if has_viz_keyword and (viz > 0 or data > 0):
             return "flow_plot"
             
         # 3. Document processing without file = still PDF tracking (might be general doc processing)
-        if has_doc_keyword and candidate_types["doc"] >= candidate_types["viz"]:
+        if has_doc_keyword and doc >= viz:
             return "flow_pdf_tracking"
             
         # 4. Data + visualization capabilities = plot flow
-        if candidate_types["viz"] > 0 and candidate_types["data"] > 0:
+        if viz > 0 and data > 0:
             return "flow_plot"
             
         # 5. Strong document processing intent (keyword + capabilities)
-        if has_doc_keyword and candidate_types["doc"] > 0:
+        if has_doc_keyword and doc > 0:
             return "flow_pdf_tracking"
             
         # 6. File provided with any document capabilities
-        if file_path and candidate_types["doc"] > 0:
+        if file_path and doc > 0:
             return "flow_pdf_tracking"
             
         # 7. Default to dynamic flow for ambiguous cases
@@ -147,28 +200,22 @@ class Router:
 
     def _has_visualization_intent(self, tags: set) -> bool:
         """Check if tags indicate visualization intent"""
-        viz_tags = {"plot", "chart", "visualization", "render", "image"}
-        data_tags = {"sql", "data", "sales", "orders"}
-        
         # Need both visualization AND data tags for plot flow
-        return bool(viz_tags.intersection(tags)) and bool(data_tags.intersection(tags))
+        return not _INTENT_VIZ_TAGS.isdisjoint(tags) and not _INTENT_DATA_TAGS.isdisjoint(tags)
     
     def _has_document_processing_intent(self, tags: set, file_path: str) -> bool:
         """Check if tags indicate document processing intent"""
-        doc_tags = {"pdf", "extract", "document", "invoice"}
-        file_tags = {"file", "upload"}
-        
         # Filter out placeholder file paths
         if file_path in ["string", "", None]:
             file_path = None
         
         # Strong document processing intent: file provided AND doc tags, OR multiple doc tags
-        return (file_path is not None and bool(doc_tags.intersection(tags))) or \
-               (bool(file_tags.intersection(tags)) and bool(doc_tags.intersection(tags)))
+        has_doc_tag = not _INTENT_DOC_TAGS.isdisjoint(tags)
+        return has_doc_tag and (file_path is not None or not _INTENT_FILE_TAGS.isdisjoint(tags))
     
     def _build_context(self, query: str, file_path: str = None, candidates: list = None) -> Dict:
         """Build context information from query, file path, and capability candidates"""
-        context = self._extract_context(query, file_path)
+        context = self._extract_context(query.lower(), file_path)
         
         # Add capability metadata to context
         if candidates:
@@ -180,31 +227,21 @@ class Router:
         
         return context
     
-    def _extract_context(self, query: str, file_path: str = None) -> Dict:
-        """Extract context information from query"""
+    def _extract_context(self, query_lower: str, file_path: str = None) -> Dict:
+        """Extract context information from a lowercased query"""
         context = {}
         
         if file_path in ["string", "", None]:
             file_path = None
         
-        if "outlet" in query.lower():
-            words = query.split()
-            for i, word in enumerate(words):
-                if word.lower() == "outlet" and i + 1 < len(words):
-                    try:
-                        outlet_num = int(words[i + 1])
-                        context["outlet"] = outlet_num
-                    except ValueError:
-                        pass
+        outlets = _OUTLET_RE.findall(query_lower)
+        if outlets:
+            context["outlet"] = int(outlets[-1])
         
         if file_path:
             context["file_path"] = file_path
         
-        import re
-        query_lower = query.lower()
-        
-        week_pattern = r'(?:last|past)?\s*(\d+)\s*weeks?'
-        week_match = re.search(week_pattern, query_lower)
+        week_match = _WEEK_RE.search(query_lower)
         
         if week_match:
             week_count = int(week_match.group(1))
@@ -221,22 +258,25 @@ class Router:
     
     def search_capabilities(self, query: str, top_k: int = 5) -> list:
         """Search capability index (simple keyword matching)"""
-        query_lower = query.lower()
-        scores = []
+        return [self._capabilities[i] for i in self._search(query.lower(), top_k)]
+    
+    def _search(self, query_lower: str, top_k: int) -> list:
+        """Positions of the top_k capabilities matching a lowercased query, best first"""
+        words = _TOKEN_RE.findall(query_lower)
+        scores = [0] * len(self._capabilities)
         
-        for cap in self.index["capabilities"]:
-            score = 0
-            # Match against tags
-            for tag in cap["tags"]:
-                if tag in query_lower:
-                    score += 2
-            # Match against description
-            if any(word in cap["description"].lower() for word in query_lower.split()):
-                score += 1
-            
-            if score > 0:
-                scores.append((score, cap))
+        # Match against tags: each distinct tag is tested once (as a substring
+        # of the query, so "charts" hits "chart") and credits its capabilities
+        for tag, positions in self._tag_postings.items():
+            if tag in query_lower:
+                for i in positions:
+                    scores[i] += 2
+        
+        # Match against description
+        for i, description in enumerate(self._descriptions):
+            if any(word in description for word in words):
+                scores[i] += 1
         
-        # Sort by score and return top k
-        scores.sort(key=lambda x: x[0], reverse=True)
-        return [cap for score, cap in scores[:top_k]]
\ No newline at end of file
+        # Top k by score; ties keep index order
+        matched = [i for i, score in enumerate(scores) if score > 0]
+        return heapq.nlargest(top_k, matched, key=scores.__getitem__)
\ No newline at end of file
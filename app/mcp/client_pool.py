@@ -46,6 +46,12 @@ class MCPClientPool:
                 "srv_tracking": TrackingServer()
             }
             self.stdio_clients = None
+            # (server, tool) -> bound tool method, from each server's manifest
+            self._tools = {
+                (name, tool["name"]): getattr(instance, tool["name"].replace('.', '_'))
+                for name, instance in self.servers.items()
+                for tool in instance.manifest()["tools"]
+            }
     
     def call_tool(self, server: str, tool: str, args: Dict[str, Any]) -> Any:
         """Call a tool on a specific server"""
@@ -56,16 +62,12 @@ class MCPClientPool:
     
     def _call_tool_direct(self, server: str, tool: str, args: Dict[str, Any]) -> Any:
         """Call tool using direct class instance (legacy mode)"""
-        if server not in self.servers:
-            raise ValueError(f"Unknown server: {server}")
-        
-        server_instance = self.servers[server]
-        tool_method = tool.replace('.', '_')  # sql.query -> sql_query
-        
-        if not hasattr(server_instance, tool_method):
+        method = self._tools.get((server, tool))
+        if method is None:
+            if server not in self.servers:
+                raise ValueError(f"Unknown server: {server}")
             raise ValueError(f"Tool {tool} not found on {server}")
         
-        method = getattr(server_instance, tool_method)
         result = method(**args)
         
         # Handle plotly special case - convert bytes to expected format
@@ -16,7 +16,10 @@ class SQLServer:
                 WHERE {sql}
                 ORDER BY week
             """
-            result = self.conn.execute(full_query).df()
+            # Tools run on worker threads; a DuckDB connection isn't safe to
+            # share between them, so each query gets its own cursor
+            with self.conn.cursor() as cursor:
+                result = cursor.execute(full_query).df()
             
             return {
                 "rows": result.to_dict('records'),
@@ -1,4 +1,5 @@
 import json
+import threading
 from pathlib import Path
 from datetime import datetime
 import uuid
@@ -7,6 +8,8 @@ from app.config import Config
 class TrackingServer:
     def __init__(self, db_path: str = None):
         self.db_path = Path(db_path or Config.TRACKING_JSON_PATH)
+        # Upserts are read-modify-write on one file; serialize concurrent tool calls
+        self._lock = threading.Lock()
         self._ensure_db()
     
     def _ensure_db(self):
@@ -18,6 +21,10 @@ class TrackingServer:
     
     def tracking_upsert(self, tracking_id: str = None, fields: dict = None) -> dict:
         """Upsert tracking record"""
+        with self._lock:
+            return self._upsert(tracking_id, fields)
+    
+    def _upsert(self, tracking_id: str = None, fields: dict = None) -> dict:
         try:
             with open(self.db_path, 'r') as f:
                 records = json.load(f)
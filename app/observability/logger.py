@@ -2,6 +2,7 @@ import structlog
 import logging
 import sys
 from datetime import datetime
+from app.config import Config
 
 def setup_logging():
     """Configure structlog for JSON output"""
@@ -25,7 +26,7 @@ def setup_logging():
     logging.basicConfig(
         format="%(message)s",
         stream=sys.stdout,
-        level=logging.INFO,
+        level=getattr(logging, Config.LOG_LEVEL, logging.INFO),
     )
     
     return structlog.get_logger()
@@ -1,9 +1,11 @@
 import json
-import hashlib
+import os
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
+import orjson
 import pandas as pd
 from app.config import Config
+from app.util.hashing import digest
 
 class ArtifactManager:
     def __init__(self, base_path: str = None):
@@ -48,7 +50,15 @@ class ArtifactManager:
         else:
             raise ValueError(f"Unsupported format: {format}")
         
-        # Return URI
+        return self.make_uri(node_id, format, filename)
+    
+    def bulk_write(self, writes: List[tuple]) -> List[str]:
+        """Write (run_id, node_id, data, format) artifacts, returning URIs in order"""
+        return [self.write(run_id, node_id, data, format=format)
+                for run_id, node_id, data, format in writes]
+    
+    def make_uri(self, node_id: str, format: str, filename: str = "output") -> str:
+        """URI an artifact is (or will be) stored under"""
         return f"artifact://{node_id}/{filename}.{format}"
     
     def read(self, uri: str, run_id: str) -> Any:
@@ -79,15 +89,38 @@ class ArtifactManager:
             raise ValueError(f"Unsupported format: {ext}")
     
     def compute_hash(self, data: Any) -> str:
-        """Compute SHA256 hash of data"""
-        if isinstance(data, (dict, list)):
-            data_str = json.dumps(data, sort_keys=True)
+        """Compute content hash of data"""
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            # Hash the buffer as-is, without copying
+            data_bytes = data
+        elif isinstance(data, (dict, list)):
+            try:
+                data_bytes = orjson.dumps(data, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+            except TypeError:
+                data_bytes = json.dumps(data, sort_keys=True, default=str).encode()
         elif isinstance(data, pd.DataFrame):
-            data_str = data.to_json()
+            data_bytes = data.to_json().encode()
         else:
-            data_str = str(data)
+            data_bytes = str(data).encode()
         
-        return hashlib.sha256(data_str.encode()).hexdigest()
+        return digest(data_bytes)
+    
+    def list_artifacts(self, run_id: str) -> List[str]:
+        """List artifact URIs for a run in a single scandir pass"""
+        run_dir = self.base_path / run_id
+        uris = []
+        try:
+            with os.scandir(run_dir) as node_dirs:
+                for node_dir in node_dirs:
+                    # DirEntry.is_dir() uses d_type from the directory read, no extra stat
+                    if not node_dir.is_dir(follow_symlinks=False):
+                        continue
+                    with os.scandir(node_dir.path) as files:
+                        for f in files:
+                            uris.append(f"artifact://{node_dir.name}/{f.name}")
+        except FileNotFoundError:
+            pass
+        return uris
     
     def get_artifact_path(self, run_id: str, node_id: str) -> Path:
         """Get directory path for node artifacts"""
@@ -1,5 +1,7 @@
 import sqlite3
 import json
+from itertools import groupby
+from operator import itemgetter
 from datetime import datetime
 from typing import Optional, Dict, List
 from pathlib import Path
@@ -122,22 +124,39 @@ class Database:
             "error": row["error"]
         }
     
+    _CREATE_NODE_SQL = """
+        INSERT INTO nodes (id, run_id, node_id, type, status, idempotency_key, start_ms)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """
+    
+    _UPDATE_NODE_SQL = """
+        UPDATE nodes
+        SET status = ?, output_artifact = ?, error = ?, 
+            start_ms = COALESCE(?, start_ms),
+            end_ms = COALESCE(?, end_ms)
+        WHERE id = ?
+    """
+    
     def create_node(self, run_id: str, node_id: str, node_type: str, 
-                    idempotency_key: str):
+                    idempotency_key: str, status: str = "pending",
+                    start_ms: Optional[int] = None):
         """Create node record"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
-        node_pk = f"{run_id}_{node_id}"
-        
-        cursor.execute("""
-            INSERT INTO nodes (id, run_id, node_id, type, status, idempotency_key)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (node_pk, run_id, node_id, node_type, "pending", idempotency_key))
+        cursor.execute(self._CREATE_NODE_SQL,
+                       self._create_node_params(run_id, node_id, node_type, idempotency_key,
+                                                status, start_ms))
         
         conn.commit()
         conn.close()
     
+    def _create_node_params(self, run_id: str, node_id: str, node_type: str,
+                            idempotency_key: str, status: str = "pending",
+                            start_ms: Optional[int] = None) -> tuple:
+        node_pk = f"{run_id}_{node_id}"
+        return (node_pk, run_id, node_id, node_type, status, idempotency_key, start_ms)
+    
     def update_node_status(self, run_id: str, node_id: str, status: str,
                           output_artifact: Optional[str] = None,
                           error: Optional[str] = None,
@@ -147,31 +166,57 @@ class Database:
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
-        node_pk = f"{run_id}_{node_id}"
-        
-        cursor.execute("""
-            UPDATE nodes
-            SET status = ?, output_artifact = ?, error = ?, 
-                start_ms = COALESCE(?, start_ms),
-                end_ms = COALESCE(?, end_ms)
-            WHERE id = ?
-        """, (status, output_artifact, error, start_ms, end_ms, node_pk))
+        cursor.execute(self._UPDATE_NODE_SQL,
+                       self._update_node_params(run_id, node_id, status, output_artifact,
+                                                error, start_ms, end_ms))
         
         conn.commit()
         conn.close()
     
-    def get_node_by_idempotency(self, idempotency_key: str) -> Optional[Dict]:
-        """Get cached node by idempotency key"""
+    def _update_node_params(self, run_id: str, node_id: str, status: str,
+                            output_artifact: Optional[str] = None,
+                            error: Optional[str] = None,
+                            start_ms: Optional[int] = None,
+                            end_ms: Optional[int] = None) -> tuple:
+        node_pk = f"{run_id}_{node_id}"
+        return (status, output_artifact, error, start_ms, end_ms, node_pk)
+    
+    def bulk_apply(self, ops: List[tuple]):
+        """Apply buffered (method, args, kwargs) node writes in one transaction"""
+        statements = {
+            "create_node": (self._CREATE_NODE_SQL, self._create_node_params),
+            "update_node_status": (self._UPDATE_NODE_SQL, self._update_node_params)
+        }
+        # Autocommit mode so the transaction is exactly the BEGIN/COMMIT below
+        conn = sqlite3.connect(self.db_path, isolation_level=None)
+        try:
+            # Take the write lock up front rather than upgrading mid-transaction
+            conn.execute("BEGIN IMMEDIATE")
+            # Runs of the same statement go through one executemany; order is kept,
+            # so a node's INSERT always precedes its UPDATEs
+            for method, group in groupby(ops, key=itemgetter(0)):
+                sql, params = statements[method]
+                conn.executemany(sql, [params(*args, **kwargs) for _, args, kwargs in group])
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+    
+    def get_node_by_idempotency(self, idempotency_key: str, min_end_ms: int = 0) -> Optional[Dict]:
+        """Get cached node by idempotency key, finished no earlier than min_end_ms"""
         conn = sqlite3.connect(self.db_path)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
         cursor.execute("""
             SELECT * FROM nodes 
-            WHERE idempotency_key = ? AND status = 'success'
+            WHERE idempotency_key = ? AND status = 'success' AND end_ms >= ?
             ORDER BY end_ms DESC
             LIMIT 1
-        """, (idempotency_key,))
+        """, (idempotency_key, min_end_ms))
         
         row = cursor.fetchone()
         conn.close()
@@ -180,9 +225,11 @@ class Database:
             return None
         
         return {
+            "run_id": row["run_id"],
             "node_id": row["node_id"],
             "output_artifact": row["output_artifact"],
-            "status": row["status"]
+            "status": row["status"],
+            "end_ms": row["end_ms"]
         }
     
     def get_run_nodes(self, run_id: str) -> List[Dict]:
@@ -197,6 +244,28 @@ class Database:
         
         return [dict(row) for row in rows]
     
+    def get_run_metrics(self, run_id: str) -> Dict:
+        """Aggregate node counts and durations for a run"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT COUNT(*),
+                   COALESCE(SUM(CASE WHEN status = 'success' THEN 1 ELSE 0 END), 0),
+                   COALESCE(SUM(CASE WHEN start_ms IS NOT NULL AND end_ms IS NOT NULL
+                                     THEN end_ms - start_ms ELSE 0 END), 0)
+            FROM nodes
+            WHERE run_id = ?
+        """, (run_id,))
+        node_count, success_count, total_duration = cursor.fetchone()
+        conn.close()
+        
+        return {
+            "total_duration_ms": total_duration,
+            "node_count": node_count,
+            "success_count": success_count
+        }
+    
     def get_metrics(self) -> Dict:
         """Get system metrics"""
         conn = sqlite3.connect(self.db_path)
@@ -0,0 +1,65 @@
+import json
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+from app.config import Config
+
+class RunCache:
+    """Terminal run results keyed by run_id.
+
+    Backed by Redis when REDIS_URL is set so every API worker sees the same
+    results; otherwise falls back to a bounded per-process LRU with the same
+    TTL (single worker only).
+    """
+
+    def __init__(self, redis_url: str = None, ttl_sec: int = None,
+                 max_entries: int = None):
+        self.redis_url = redis_url or Config.REDIS_URL
+        self.ttl_sec = ttl_sec or Config.RUN_CACHE_TTL_SEC
+        self.max_entries = max_entries or Config.RUN_CACHE_MAX_ENTRIES
+        self._redis = None
+        # run_id -> (expires_at, payload), least recently used first
+        self._local: "OrderedDict[str, tuple]" = OrderedDict()
+        
+        if self.redis_url:
+            import redis.asyncio as redis
+            
+            # Pooled connections avoid a connect per request
+            self._redis = redis.Redis.from_url(
+                self.redis_url,
+                max_connections=Config.REDIS_MAX_CONNECTIONS
+            )
+    
+    def _key(self, run_id: str) -> str:
+        return f"run:{run_id}"
+    
+    async def set(self, run_id: str, payload: Dict):
+        """Store run result with TTL"""
+        if self._redis is not None:
+            await self._redis.set(self._key(run_id), json.dumps(payload), ex=self.ttl_sec)
+        else:
+            self._local[run_id] = (time.monotonic() + self.ttl_sec, payload)
+            self._local.move_to_end(run_id)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+    
+    async def get(self, run_id: str) -> Optional[Dict]:
+        """Get run result, None if not finished (or expired)"""
+        if self._redis is not None:
+            raw = await self._redis.get(self._key(run_id))
+            return json.loads(raw) if raw else None
+        
+        entry = self._local.get(run_id)
+        if entry is None:
+            return None
+        expires_at, payload = entry
+        if expires_at <= time.monotonic():
+            del self._local[run_id]
+            return None
+        self._local.move_to_end(run_id)
+        return payload
+    
+    async def aclose(self):
+        """Release pooled Redis connections"""
+        if self._redis is not None:
+            await self._redis.aclose()
@@ -0,0 +1,25 @@
+"""Cheap short ids for runs and plans.
+
+Ids only need to be unique, not unguessable, so a per-thread PRNG seeded
+once from os.urandom replaces uuid4 (one getrandom syscall + UUID object
+per call).
+"""
+import os
+import random
+import threading
+
+_tls = threading.local()
+
+# Forked workers must not replay the parent's sequence
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=lambda: _tls.__dict__.clear())
+
+def _rng() -> random.Random:
+    rng = getattr(_tls, "rng", None)
+    if rng is None:
+        rng = _tls.rng = random.Random(os.urandom(32))
+    return rng
+
+def short_id() -> str:
+    """Return 8 random hex chars"""
+    return _rng().getrandbits(32).to_bytes(4, "big").hex()
@@ -0,0 +1,18 @@
+"""Non-cryptographic content digests for cache keys and output hashes.
+
+Uses xxHash (XXH3-128) when the optional `xxhash` package is installed and
+BLAKE2b otherwise. Digests only need to be stable within a deployment, so
+install it on every worker or none.
+"""
+import hashlib
+
+try:
+    import xxhash
+except ImportError:  # optional speedup
+    xxhash = None
+
+def digest(data) -> str:
+    """Hex digest of a bytes-like object"""
+    if xxhash is not None:
+        return xxhash.xxh3_128_hexdigest(data)
+    return hashlib.blake2b(data, digest_size=32).hexdigest()
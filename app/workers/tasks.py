@@ -0,0 +1,60 @@
+"""Run execution tasks
+
+`run_plan` is used directly by the API's BackgroundTasks (RUN_QUEUE=background).
+With RUN_QUEUE=arq the API enqueues `execute_run` instead, executed by a
+separate worker process:
+
+    arq app.workers.tasks.WorkerSettings
+"""
+import asyncio
+from typing import Dict
+from app.api.dependencies import get_artifacts, get_executor, get_run_cache, size_thread_pool
+from app.core.executor_simple import shutdown_pdf_pool
+from app.config import Config
+
+try:
+    from arq.connections import RedisSettings
+except ImportError:  # arq is only needed when RUN_QUEUE=arq
+    RedisSettings = None
+
+async def run_plan(run_id: str, plan: Dict):
+    """Execute run and store result"""
+    artifacts = get_artifacts()
+    run_cache = get_run_cache()
+    try:
+        result = await get_executor().execute(run_id, plan)
+        await run_cache.set(run_id, {
+            "status": "success",
+            "result": result,
+            "artifacts": await asyncio.to_thread(artifacts.list_artifacts, run_id)
+        })
+    except Exception as e:
+        await run_cache.set(run_id, {
+            "status": "failed",
+            "result": None,
+            "error": str(e),
+            "artifacts": await asyncio.to_thread(artifacts.list_artifacts, run_id)
+        })
+
+async def execute_run(ctx: Dict, run_id: str, plan: Dict):
+    """ARQ job wrapper around run_plan"""
+    await run_plan(run_id, plan)
+
+async def startup(ctx: Dict):
+    # Without it arq falls back to localhost Redis and results land in a
+    # process-local cache the API never sees
+    if not Config.REDIS_URL:
+        raise RuntimeError("ARQ workers require REDIS_URL (shared with the API)")
+    Config.validate()
+    size_thread_pool()
+
+async def shutdown(ctx: Dict):
+    await get_run_cache().aclose()
+    shutdown_pdf_pool()
+
+class WorkerSettings:
+    """ARQ worker configuration"""
+    functions = [execute_run]
+    on_startup = startup
+    on_shutdown = shutdown
+    redis_settings = RedisSettings.from_dsn(Config.REDIS_URL) if RedisSettings and Config.REDIS_URL else None
@@ -1,33 +1,38 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from app.api.routes import router
+from app.api.dependencies import warm_up, size_thread_pool, get_run_cache, close_arq_pool
+from app.core.executor_simple import shutdown_pdf_pool
 from app.observability.logger import logger
 from app.config import Config
 import uvicorn
-from dotenv import load_dotenv
 import os
 
-# Load environment variables from .env file
-load_dotenv()
-
 # Ensure directories exist
 Config.ensure_directories()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build components once per worker, before serving traffic
+    Config.validate()
+    size_thread_pool()
+    warm_up()
+    logger.info("application_started")
+    yield
+    await close_arq_pool()
+    await get_run_cache().aclose()
+    shutdown_pdf_pool()
+    logger.info("application_stopped")
+
 app = FastAPI(
     title="Agent Orchestrator",
     description="MCP + DAG Orchestration System",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 app.include_router(router)
 
-@app.on_event("startup")
-async def startup_event():
-    logger.info("application_started")
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    logger.info("application_stopped")
-
 @app.get("/")
 async def root():
     return {